@@ -55,16 +55,25 @@ class DatabaseService {
   async getAllRecommendations() {
     try {
       console.log('Fetching recommendations from API...');
-      const response = await fetch(`${API_BASE_URL}/api/recommendations`);
-      
-      if (!response.ok) {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
-      
-      const data = await response.json();
-      console.log('Recommendations received:', data.length, 'records');
-      
-      return data;
+      // Paginated API: follow nextCursor until the history is exhausted
+      const items = [];
+      let cursor = null;
+      do {
+        const params = cursor ? `?limit=50&before=${cursor}` : '?limit=50';
+        const response = await fetch(`${API_BASE_URL}/api/recommendations${params}`);
+
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        const page = await response.json();
+        items.push(...(page.items || []));
+        cursor = page.nextCursor;
+      } while (cursor);
+
+      console.log('Recommendations received:', items.length, 'records');
+
+      return items;
     } catch (error) {
       console.error('Error fetching recommendations:', error);
       return this.getFallbackRecommendations();
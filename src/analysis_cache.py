@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import math
+
+from sqlalchemy.orm import sessionmaker
+
+# Child of the pipeline logger - records flow through the queue handler
+# configured in main.py
+logger = logging.getLogger('pipeline.cache')
+
+class AnalysisCache:
+    """
+    ANALYSIS CACHE - Two-tier cache for LLM stock analysis results
+
+    PURPOSE: Avoid paying an LLM round-trip when we already analyzed the same
+    (or a nearly identical) trading day
+    BUSINESS VALUE: LLM calls dominate pipeline wall time and API cost;
+    reruns and --force backfills become effectively free
+
+    TWO CACHE TIERS:
+    1. EXACT TIER - In-process dict keyed by a hash of symbol, date and
+       rounded OHLCV values. A hit returns the stored analysis untouched.
+    2. SEMANTIC TIER - A 5-float feature fingerprint (price change %,
+       intraday range, vwap delta, close-vs-high/low) compared by cosine
+       similarity against fingerprints of previously stored
+       AIRecommendations rows. A near match (>= threshold) in the same
+       market direction reuses the stored analysis instead of generating
+       a new one.
+
+    WHY TWO TIERS:
+    - Exact tier catches literal reruns (same date, same data)
+    - Semantic tier catches "close enough" days where the analysis would be
+      materially identical anyway
+    """
+
+    SIMILARITY_THRESHOLD = 0.98
+    SEMANTIC_SCAN_LIMIT = 250
+
+    def __init__(self, db=None):
+        """
+        CONSTRUCTOR - Set up empty cache tiers
+
+        PARAMETERS:
+        - db: DatabaseManager instance used to pull stored fingerprints for
+          the semantic tier (optional - without it only the exact tier works)
+        """
+        self.db = db
+        self._exact = {}
+        self._stored_fingerprints = None  # Loaded once per process, lazily
+        self._session_factory = None      # Dedicated non-scoped factory
+
+    def exact_key(self, stock_data):
+        """
+        EXACT KEY BUILDER - Stable hash for a single trading day
+
+        Rounds prices to 2 decimals and buckets volume to the nearest 100k so
+        trivially different floats from repeated API fetches still collide.
+        """
+        raw = "|".join([
+            str(stock_data.symbol),
+            str(stock_data.date),
+            str(round(stock_data.open_price, 2)),
+            str(round(stock_data.close_price, 2)),
+            str(round(stock_data.vwap, 2) if stock_data.vwap else 0),
+            str(int(stock_data.volume // 100000))
+        ])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def fingerprint(self, stock_data):
+        """
+        FEATURE FINGERPRINT - 5-float vector describing the trading day
+
+        Captures the shape of the day (direction, magnitude, volatility,
+        close position) rather than absolute prices, so similar market
+        behavior on different days produces similar vectors.
+
+        Every component is a percent-scale measure, so no single feature
+        can dominate the cosine. Near-constant terms (a bias entry, raw
+        log-volume, the open/close ratio) are deliberately excluded: they
+        sat around the same value for every trading day and swamped the
+        small direction features, scoring a +0.5% day against a -0.5% day
+        above the similarity threshold.
+        """
+        open_p = stock_data.open_price
+        close_p = stock_data.close_price
+        high_p = stock_data.high_price
+        low_p = stock_data.low_price
+        vwap = stock_data.vwap or close_p
+
+        change_pct = ((close_p - open_p) / open_p) * 100 if open_p else 0
+        range_pct = ((high_p - low_p) / open_p) * 100 if open_p else 0
+        vwap_delta = ((close_p - vwap) / vwap) * 100 if vwap else 0
+        close_vs_high = ((high_p - close_p) / high_p) * 100 if high_p else 0
+        close_vs_low = ((close_p - low_p) / low_p) * 100 if low_p else 0
+
+        return [
+            round(change_pct, 3),
+            round(range_pct, 3),
+            round(vwap_delta, 3),
+            round(close_vs_high, 3),
+            round(close_vs_low, 3)
+        ]
+
+    @staticmethod
+    def _direction(change_pct):
+        """Sentiment-direction bucket of a day: -1 down, 0 flat, +1 up"""
+        if change_pct > 0:
+            return 1
+        if change_pct < 0:
+            return -1
+        return 0
+
+    def _cosine_similarity(self, a, b):
+        """COSINE SIMILARITY - Standard dot-product similarity of two vectors"""
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(x * x for x in b))
+        if norm_a == 0 or norm_b == 0:
+            return 0.0
+        return dot / (norm_a * norm_b)
+
+    def _load_stored_fingerprints(self):
+        """
+        FINGERPRINT LOADER - Pull recent stored analyses once per process
+
+        Reads the last SEMANTIC_SCAN_LIMIT AIRecommendations rows that carry
+        a fingerprint and keeps (fingerprint, analysis_dict) pairs in memory
+        for the linear cosine scan. Returns [] when no database is available.
+        """
+        if self._stored_fingerprints is not None:
+            return self._stored_fingerprints
+
+        self._stored_fingerprints = []
+        if not self.db or not self.db.is_connected():
+            return self._stored_fingerprints
+
+        try:
+            from database import AIRecommendations
+
+            # A DEDICATED, NON-SCOPED SESSION - db.session() hands back the
+            # process-wide scoped session, which inside the pipeline's open
+            # storage transaction is the SAME Session object; committing and
+            # closing it here would commit the caller's half-done unit of
+            # work mid-run. This factory always builds an independent
+            # Session on its own pooled connection.
+            if self._session_factory is None:
+                self._session_factory = sessionmaker(bind=self.db.engine,
+                                                     expire_on_commit=False)
+            session = self._session_factory()
+            try:
+                rows = session.query(AIRecommendations).filter(
+                    AIRecommendations.fingerprint.isnot(None)
+                ).order_by(AIRecommendations.id.desc()).limit(self.SEMANTIC_SCAN_LIMIT).all()
+
+                for row in rows:
+                    self._stored_fingerprints.append((row.fingerprint, {
+                        'sentiment': row.sentiment,
+                        'risk_score': row.risk_score,
+                        'recommendations': row.recommendations,
+                        'price_prediction': row.price_prediction,
+                        'full_analysis': row.full_analysis,
+                        'model_used': row.model_used
+                    }))
+            finally:
+                session.close()
+        except Exception as e:
+            logger.warning("Could not load stored fingerprints: %s", e)
+
+        return self._stored_fingerprints
+
+    def warm(self):
+        """
+        EAGER WARM-UP - Load stored fingerprints ahead of time
+
+        Call this BEFORE opening a pipeline storage transaction: the load
+        runs on the cache's own session, and once it has happened the
+        semantic tier never touches the database from inside a caller's
+        unit of work.
+        """
+        self._load_stored_fingerprints()
+
+    def get_or_compute(self, stock_data, compute_fn):
+        """
+        MAIN ENTRY POINT - Return cached analysis or generate a fresh one
+
+        LOOKUP ORDER:
+        1. Exact tier (hash hit -> return immediately, no LLM call)
+        2. Semantic tier (cosine >= threshold -> reuse stored analysis)
+        3. Miss -> call compute_fn(stock_data), store in both tiers
+
+        The returned analysis always carries a 'fingerprint' entry so the
+        caller can persist it alongside the recommendation row.
+        """
+        key = self.exact_key(stock_data)
+        if key in self._exact:
+            logger.debug("Cache hit (exact) for %s %s", stock_data.symbol, stock_data.date)
+            return self._exact[key]
+
+        fp = self.fingerprint(stock_data)
+        for stored_fp, stored_analysis in self._load_stored_fingerprints():
+            # Fingerprints from an older vector layout can't be compared
+            if not stored_fp or len(stored_fp) != len(fp):
+                continue
+            # Never reuse an analysis from the opposite market direction -
+            # change_pct is the first component of the vector
+            if self._direction(stored_fp[0]) != self._direction(fp[0]):
+                continue
+            if self._cosine_similarity(fp, stored_fp) >= self.SIMILARITY_THRESHOLD:
+                logger.debug("Cache hit (semantic) for %s %s", stock_data.symbol, stock_data.date)
+                analysis = dict(stored_analysis)
+                analysis['fingerprint'] = fp
+                self._exact[key] = analysis
+                return analysis
+
+        analysis = compute_fn(stock_data)
+        if analysis:
+            analysis['fingerprint'] = fp
+            self._exact[key] = analysis
+        return analysis
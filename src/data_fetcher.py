@@ -1,12 +1,112 @@
+import logging
 import requests
 import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 
+# Fastest available JSON codec (simdjson -> orjson -> stdlib), probed once
+# at import; several times faster than the stdlib decoder requests uses
+# internally on machines where the accelerated backends are installed
+import json_backend
+
+# msgspec decodes + validates the payload straight into a typed slotted
+# struct at C speed - no intermediate dict, no .get() chains. Optional:
+# the json_backend path below stays as the fallback
+try:
+    import msgspec
+
+    class OpenCloseResp(msgspec.Struct):
+        """Typed shape of Polygon's open-close payload (unknown keys ignored)"""
+        status: str = ''
+        open: float = 0.0
+        close: float = 0.0
+        high: float = 0.0
+        low: float = 0.0
+        volume: float = 0.0
+        vwap: float = 0.0
+        transactions: int = 0
+        afterHours: float = 0.0
+        preMarket: float = 0.0
+        otc: bool = False
+
+    _OPEN_CLOSE_DECODER = msgspec.json.Decoder(OpenCloseResp)
+except ImportError:
+    msgspec = None
+
+class RateLimiter:
+    """
+    RATE LIMITER - Token-bucket style guard for the Polygon API quota
+
+    PURPOSE: Concurrent backfills must not burst past Polygon's rate limit
+    (5 requests/minute on the free tier, much higher on paid plans)
+
+    HOW IT WORKS:
+    - Tracks request timestamps in a sliding 60-second window
+    - When the window is full, the calling thread sleeps until the oldest
+      request ages out
+    - A limit of 0 disables throttling entirely (paid plans)
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self._lock = threading.Lock()
+        self._timestamps = deque()
+
+    def acquire(self):
+        """Block until a request slot is available within the rate window"""
+        if not self.per_minute:
+            return
+        with self._lock:
+            now = time.monotonic()
+            while self._timestamps and now - self._timestamps[0] >= 60:
+                self._timestamps.popleft()
+            if len(self._timestamps) >= self.per_minute:
+                wait = 60 - (now - self._timestamps[0])
+                time.sleep(wait)
+                self._timestamps.popleft()
+            self._timestamps.append(time.monotonic())
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Child of the pipeline logger so records flow through the non-blocking
+# queue handler configured in main.py. Lazy %s formatting means a disabled
+# level costs a single check instead of an f-string build + stdout flush
+# per fetch - noticeable across a large backfill
+logger = logging.getLogger('pipeline.fetcher')
+
+@dataclass(slots=True)
+class DailyRow:
+    """
+    DAILY ROW - One formatted trading day, as produced by the fetcher
+
+    PURPOSE: Fixed-shape record for the OHLCV fields every downstream
+    consumer (database models, LLM analyzer, analysis cache) reads
+
+    WHY A SLOTS DATACLASS INSTEAD OF A DICT:
+    - A fresh 10-key dict per day costs ~3x the memory of a slots instance
+      and hashes every key on each access; large multi-symbol backfills
+      allocate one of these per (symbol, date)
+    - Attribute access makes typos fail loudly instead of returning None
+    """
+    date: object                # datetime.date of the trading day
+    symbol: str                 # 'AAPL' - stock ticker symbol
+    open_price: float
+    close_price: float
+    high_price: float
+    low_price: float
+    volume: int
+    vwap: float
+    transactions: int
+    raw_data: dict              # Non-schema payload extras, or None
+
 class PolygonDataFetcher:
     """
     DATA FETCHER CLASS - The Stock Data Collector
@@ -28,11 +128,90 @@ class PolygonDataFetcher:
         WHY WE DO THIS:
         - Get API key from environment variables (secure storage)
         - Set up the base URL for Polygon.io API calls
-        - Prepare for making authenticated requests to financial data service
+        - Share one pooled HTTP session so repeated calls reuse the TCP+TLS
+          connection instead of re-handshaking (~100-300ms saved per call)
+        - Retry transient failures (429/5xx) with backoff instead of
+          silently returning None
         """
         self.api_key = os.getenv('POLYGON_API_KEY')
         self.base_url = "https://api.polygon.io/v1/open-close"
-        
+        # Pre-normalized prefix so the per-call URL is plain concatenation
+        # (no f-string formatting per fetch in concurrent backfills)
+        self._base = self.base_url.rstrip('/') + '/'
+
+        # POOLED SESSION - Keep-alive connections + automatic retry
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504]
+        )
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            max_retries=retry
+        ))
+        self.session.headers.update({'Accept-Encoding': 'gzip'})
+
+        # AUTH HEADER - Polygon accepts Bearer auth; sending it once on the
+        # session keeps the key out of every URL (shorter requests, no key
+        # in proxy/server logs) instead of repeating an apikey query param
+        if self.api_key:
+            self.session.headers['Authorization'] = f'Bearer {self.api_key}'
+
+        # RATE LIMITER - Shared by all worker threads during concurrent fetches
+        # POLYGON_RATE_LIMIT is requests/minute; 0 disables throttling
+        self.rate_limiter = RateLimiter(int(os.getenv('POLYGON_RATE_LIMIT', 0)))
+
+        # ON-DISK RESPONSE CACHE - Closed trading days never change, so their
+        # payloads are cached forever; re-running a backfill costs file reads
+        # instead of API calls (and doesn't burn rate-limit quota)
+        self.cache_dir = os.getenv('POLYGON_CACHE_DIR', '.polygon_cache')
+
+        # DEMO-MODE SHORT-CIRCUIT - The key can't change mid-process, so
+        # resolve the mode once here: rebinding fetch_daily_data on the
+        # instance removes the per-call string compare and the repeated
+        # warning spam from tight backfill loops
+        self.demo_mode = not self.api_key or self.api_key == "your_polygon_key_here"
+        if self.demo_mode:
+            logger.warning("Using demo mode - need real API key for live data")
+            self.fetch_daily_data = self._get_demo_data
+
+    def _cache_path(self, symbol, date):
+        """Cache file location for one (symbol, date) payload"""
+        return os.path.join(self.cache_dir, f"{symbol}_{date}.json")
+
+    def _cache_get(self, symbol, date):
+        """
+        CACHE LOOKUP - Return the stored payload bytes for a closed day, or None
+
+        Only closed days are served from disk: today's (or a future) date may
+        still have partial data, so those always go to the network.
+        """
+        try:
+            if datetime.fromisoformat(str(date)).date() >= datetime.now().date():
+                return None
+            with open(self._cache_path(symbol, date), 'rb') as f:
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        except Exception as e:
+            logger.warning("Cache read failed for %s %s: %s", symbol, date, e)
+            return None
+
+    def _cache_put(self, symbol, date, payload):
+        """CACHE STORE - Persist validated payload bytes for a closed day"""
+        try:
+            if datetime.fromisoformat(str(date)).date() >= datetime.now().date():
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not isinstance(payload, (bytes, bytearray)):
+                payload = json_backend.dumps(payload)
+            with open(self._cache_path(symbol, date), 'wb') as f:
+                f.write(payload)
+        except Exception as e:
+            logger.warning("Cache write failed for %s %s: %s", symbol, date, e)
+
     def fetch_daily_data(self, symbol, date):
         """
         MAIN METHOD - Fetch complete daily stock data for a specific symbol and date
@@ -42,46 +221,134 @@ class PolygonDataFetcher:
         - date: Date in YYYY-MM-DD format (e.g., '2025-09-10')
         
         RETURNS:
-        Dictionary with complete stock data or None if failed
+        DailyRow with complete stock data or None if failed
         
         BUSINESS PURPOSE:
         - Get yesterday's complete market data for AI analysis
         - Ensure we have all key metrics: open, close, high, low, volume
         - Provide foundation data for investment recommendations
         """
-        
-        # SAFETY CHECK: If no API key available, use demo mode
-        if not self.api_key or self.api_key == "your_polygon_key_here":
-            print("Warning: Using demo mode - need real API key for live data")
-            return self._get_demo_data(symbol, date)
-            
-        # BUILD THE API REQUEST
-        # Example: https://api.polygon.io/v1/open-close/AAPL/2025-09-10?apikey=xxx
-        url = f"{self.base_url}/{symbol}/{date}"
-        params = {"apikey": self.api_key}
-        
+
+        # NOTE: demo mode is handled in __init__ (fetch_daily_data is
+        # rebound to _get_demo_data there), so this path is live-data only
+
+        # DISK CACHE CHECK - Immutable closed days skip the network entirely
+        cached = self._cache_get(symbol, date)
+        if cached is not None:
+            return self._decode_payload(cached, symbol, date)
+
+        # BUILD THE API REQUEST - auth rides on the session's Bearer header
+        # Example: https://api.polygon.io/v1/open-close/AAPL/2025-09-10
+        url = self._base + symbol + '/' + str(date)
+
         try:
-            print(f"Fetching data for {symbol} on {date}...")
-            response = requests.get(url, params=params)
+            self.rate_limiter.acquire()
+            logger.debug("Fetching %s %s", symbol, date)
+            response = self.session.get(url, timeout=(3.05, 10))
             
             # CHECK IF API CALL WAS SUCCESSFUL
             if response.status_code == 200:
-                data = response.json()
-                
-                # VALIDATE API RESPONSE
-                if data.get('status') == 'OK':
-                    return self._format_data(data, symbol, date)
-                else:
-                    print(f"API Error: {data.get('error', 'Unknown error')}")
-                    return None
+                # DECODE + VALIDATE - typed struct when msgspec is installed
+                row = self._decode_payload(response.content, symbol, date)
+                if row is not None:
+                    self._cache_put(symbol, date, response.content)
+                return row
             else:
-                print(f"HTTP Error: {response.status_code}")
+                logger.warning("HTTP %s for %s %s", response.status_code, symbol, date)
                 return None
-                
+
         except Exception as e:
-            print(f"Request failed: {e}")
+            logger.error("Request failed for %s %s: %s", symbol, date, e)
             return None
+
+    def _decode_payload(self, content, symbol, date):
+        """
+        PAYLOAD DECODER - Turn one open-close response body into a DailyRow
+
+        With msgspec installed the bytes decode straight into a typed,
+        slotted struct - C-level parse with schema validation for free and
+        no intermediate dict. Without it, the json_backend parse plus
+        _format_data's .get() extraction is the fallback.
+        """
+        if msgspec is not None:
+            try:
+                resp = _OPEN_CLOSE_DECODER.decode(content)
+            except msgspec.DecodeError as e:
+                logger.warning("Malformed payload for %s %s: %s", symbol, date, e)
+                return None
+            if resp.status != 'OK':
+                logger.warning("API error for %s %s: status=%s", symbol, date, resp.status)
+                return None
+            extras = {}
+            if resp.afterHours:
+                extras['afterHours'] = resp.afterHours
+            if resp.preMarket:
+                extras['preMarket'] = resp.preMarket
+            if resp.otc:
+                extras['otc'] = resp.otc
+            return DailyRow(
+                date=datetime.fromisoformat(date).date() if isinstance(date, str) else date,
+                symbol=symbol,
+                open_price=round(resp.open, 2),
+                close_price=round(resp.close, 2),
+                high_price=round(resp.high, 2),
+                low_price=round(resp.low, 2),
+                volume=int(resp.volume),
+                vwap=round(resp.vwap, 2),
+                transactions=resp.transactions,
+                raw_data=extras or None
+            )
+
+        data = json_backend.loads(content)
+        if data.get('status') == 'OK':
+            return self._format_data(data, symbol, date)
+        logger.warning("API error for %s %s: %s", symbol, date, data.get('error', 'Unknown error'))
+        return None
     
+    def fetch_many(self, symbol, dates, max_workers=16):
+        """
+        CONCURRENT BATCH FETCHER - Fetch many trading dates in parallel
+
+        PARAMETERS:
+        - symbol: Stock ticker (e.g., 'AAPL')
+        - dates: Iterable of YYYY-MM-DD date strings
+        - max_workers: Thread pool size (network I/O overlaps across threads)
+
+        RETURNS:
+        List of (date, data_dict_or_None) tuples in the same order as input
+
+        BUSINESS PURPOSE:
+        - Backfilling a month of history one date at a time serializes
+          ~200-500ms of network latency per call; overlapping the requests
+          makes a 30-day backfill near-instant (bounded by the rate limit)
+        - The shared session pool and rate limiter keep us within Polygon's
+          quota while still saturating the allowed request rate
+        """
+        pairs = self.fetch_pairs([(symbol, date) for date in dates], max_workers=max_workers)
+        return [(date, data) for (_, date), data in pairs]
+
+    def fetch_pairs(self, pairs, max_workers=16):
+        """
+        CONCURRENT MULTI-SYMBOL FETCHER - Fetch arbitrary (symbol, date) pairs
+
+        PARAMETERS:
+        - pairs: Iterable of (symbol, date) tuples
+        - max_workers: Thread pool size
+
+        RETURNS:
+        List of ((symbol, date), data_dict_or_None) tuples in input order
+
+        BUSINESS PURPOSE:
+        - Generalizes the concurrent fetch path beyond a single symbol so
+          multi-ticker workloads overlap their network round-trips too
+        - Each worker goes through fetch_daily_data, so the shared keep-alive
+          session, retry policy and rate limiter all still apply
+        """
+        pairs = list(pairs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda pair: self.fetch_daily_data(*pair), pairs)
+            return list(zip(pairs, results))
+
     def _format_data(self, raw_data, symbol, date):
         """
         DATA FORMATTER - Convert raw API response into clean, structured format
@@ -98,19 +365,38 @@ class PolygonDataFetcher:
         - Our database and AI analyzer expect consistent field names
         - If Polygon.io changes their format, we only need to update this one function
         - Provides data validation and type consistency
+        - Quantizing at ingest (prices to cents, volume to whole shares)
+          keeps cache keys stable across refetches and shrinks DB indexes
         """
-        return {
-            'date': date,
-            'symbol': symbol,
-            'open_price': raw_data.get('open'),          # Market opening price
-            'close_price': raw_data.get('close'),        # Market closing price  
-            'high_price': raw_data.get('high'),          # Highest price of the day
-            'low_price': raw_data.get('low'),            # Lowest price of the day
-            'volume': raw_data.get('volume'),            # Number of shares traded
-            'vwap': raw_data.get('vwap'),               # Volume-weighted average price
-            'transactions': raw_data.get('transactions', 0),  # Number of individual trades
-            'raw_data': raw_data                         # Store complete API response for debugging
+        def cents(value):
+            return round(value, 2) if value is not None else None
+
+        volume = raw_data.get('volume')
+
+        # Keep only payload keys NOT already lifted into schema columns
+        # (afterHours, preMarket, otc, ...) - storing the full payload again
+        # would double the write bandwidth just to duplicate the OHLCV
+        # fields into TOAST storage
+        extras = {
+            k: v for k, v in raw_data.items()
+            if k not in {'open', 'close', 'high', 'low', 'volume', 'vwap',
+                         'transactions', 'status', 'symbol', 'from'}
         }
+
+        return DailyRow(
+            # Native date object - the DB column is DATE now, so no text
+            # comparison or implicit cast happens downstream
+            date=datetime.fromisoformat(date).date() if isinstance(date, str) else date,
+            symbol=symbol,
+            open_price=cents(raw_data.get('open')),   # Market opening price
+            close_price=cents(raw_data.get('close')), # Market closing price
+            high_price=cents(raw_data.get('high')),   # Highest price of the day
+            low_price=cents(raw_data.get('low')),     # Lowest price of the day
+            volume=int(volume) if volume is not None else None,  # Number of shares traded
+            vwap=cents(raw_data.get('vwap')),        # Volume-weighted average price
+            transactions=raw_data.get('transactions', 0),  # Number of individual trades
+            raw_data=extras or None                   # Only the non-schema leftovers, if any
+        )
     
     def _get_demo_data(self, symbol, date):
         """
@@ -126,19 +412,19 @@ class PolygonDataFetcher:
         - System can be demonstrated even if API is temporarily unavailable
         - Provides fallback for graceful degradation in production
         """
-        print(f"Demo mode: Generating sample data for {symbol}")
-        return {
-            'date': date,
-            'symbol': symbol,
-            'open_price': 150.25,      # Realistic opening price
-            'close_price': 152.80,     # Small price movement (bullish)
-            'high_price': 154.20,      # Day's high price
-            'low_price': 149.50,       # Day's low price
-            'volume': 25000000,        # Typical daily volume
-            'vwap': 151.75,           # Volume-weighted average
-            'transactions': 85000,     # Number of trades
-            'raw_data': {'status': 'demo_data'}  # Mark as demo data
-        }
+        logger.debug("Demo mode: generating sample data for %s", symbol)
+        return DailyRow(
+            date=datetime.fromisoformat(date).date() if isinstance(date, str) else date,
+            symbol=symbol,
+            open_price=150.25,      # Realistic opening price
+            close_price=152.80,     # Small price movement (bullish)
+            high_price=154.20,      # Day's high price
+            low_price=149.50,       # Day's low price
+            volume=25000000,        # Typical daily volume
+            vwap=151.75,           # Volume-weighted average
+            transactions=85000,     # Number of trades
+            raw_data={'status': 'demo_data'}  # Mark as demo data
+        )
 
 # TESTING FUNCTION - Verify the data fetcher works correctly
 def test_fetcher():
@@ -161,7 +447,7 @@ def test_fetcher():
     
     if data:
         print("Data fetched successfully!")
-        print(f"Sample: {data['symbol']} - Close: ${data['close_price']}")
+        print(f"Sample: {data.symbol} - Close: ${data.close_price}")
         return True
     else:
         print("Failed to fetch data")
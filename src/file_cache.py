@@ -0,0 +1,75 @@
+"""
+FILE CACHE - On-disk store for raw LLM responses
+
+PURPOSE: A finished analysis of a historical trading day never changes, so
+re-running the scheduler (or a backtest) should replay the stored model
+response instead of paying a multi-second LLM round-trip and its API cost
+
+LAYOUT: One JSON file per entry under .cache/llm/{symbol}/{date}_{key}.json
+holding {timestamp, model, response}; the key is a hash of model + prompt
+so a model swap or prompt change naturally misses old entries
+
+WHY A SEPARATE TIER FROM AnalysisCache:
+- AnalysisCache memoizes parsed results in-process and semantically;
+  this tier persists the raw response across process restarts
+"""
+
+import logging
+import os
+import time
+
+import json_backend
+
+# Child of the pipeline logger - records flow through the queue handler
+# configured in main.py
+logger = logging.getLogger('pipeline.cache')
+
+
+class FileCache:
+    """
+    FILE CACHE CLASS - TTL-checked per-(symbol, date, key) JSON files
+
+    Entries default to a 90-day TTL (LLM_CACHE_TTL_DAYS) - historical
+    analyses are immutable, the expiry just bounds disk growth.
+    """
+
+    def __init__(self, root=None, ttl_days=None):
+        self.root = root or os.getenv('LLM_CACHE_DIR', os.path.join('.cache', 'llm'))
+        self.ttl_seconds = (ttl_days or int(os.getenv('LLM_CACHE_TTL_DAYS', 90))) * 86400
+
+    def _path(self, symbol, date, key):
+        """Cache file location for one entry"""
+        return os.path.join(self.root, str(symbol), f"{date}_{key}.json")
+
+    def get(self, symbol, date, key):
+        """
+        CACHE LOOKUP - Return the stored raw response, or None
+
+        RETURNS None when the entry is missing, expired, or unreadable -
+        callers just fall through to the live LLM call.
+        """
+        try:
+            with open(self._path(symbol, date, key), 'rb') as f:
+                entry = json_backend.loads(f.read())
+            if time.time() - entry.get('timestamp', 0) > self.ttl_seconds:
+                return None
+            return entry.get('response')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("LLM cache read failed for %s %s: %s", symbol, date, e)
+            return None
+
+    def put(self, symbol, date, key, model, response):
+        """CACHE STORE - Persist one raw response with its model and timestamp"""
+        try:
+            path = self._path(symbol, date, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(json_backend.dumps({
+                    'timestamp': time.time(),
+                    'model': model,
+                    'response': response
+                }))
+        except Exception as e:
+            logger.warning("LLM cache write failed for %s %s: %s", symbol, date, e)
@@ -1,13 +1,242 @@
+import asyncio
+import functools
+import hashlib
+import logging
 import os
 import json
 import requests
-import re
+import time
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from file_cache import FileCache
+
+# Accelerated parse for model responses (simdjson/orjson when installed);
+# the stdlib module stays imported for its more lenient decoder, which the
+# response cleaner falls back to on strict-parse failures
+import json_backend
+
+# httpx powers the async fan-out path (analyze_many); the blocking requests
+# path remains fully functional without it
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# numpy vectorizes the rule-based fallback over whole batches (it ships with
+# the pandas dependency, but the per-row scalar path covers its absence)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# FALLBACK CLASSIFICATION BUCKETS - change_pct thresholds at -2% / +2%
+# shared by the scalar fallback, demo analysis, and the vectorized batch
+_FALLBACK_SENTIMENTS = ['bearish', 'neutral', 'bullish']
+_FALLBACK_RISKS = [7, 5, 4]
+
+# DEFAULT RECOMMENDATIONS - One frozen tuple reused whenever a response
+# carries no usable advice list, instead of allocating a fresh list per parse
+DEFAULT_RECS = ('Monitor market conditions', 'Review position sizing', 'Watch key levels')
+
+
+@functools.lru_cache(maxsize=4096)
+def _demo_analysis_json(sentiment, price_change, close_price):
+    """
+    MEMOIZED DEMO RESPONSE - Build the sample-analysis JSON string once per
+    (sentiment, rounded change, rounded close) bucket
+
+    Demo-mode backtests revisit the same buckets constantly; the cache hit
+    returns the precomputed string and only misses pay for json.dumps.
+    Module-level (not a method) so the cache key stays plain scalars.
+    """
+    return json.dumps({
+        "sentiment": sentiment,
+        "risk_score": 5,
+        "recommendations": [
+            "Monitor volume trends for momentum confirmation",
+            "Watch for price action near VWAP levels",
+            "Consider position sizing based on volatility"
+        ],
+        "price_prediction": round(close_price * 1.02, 2),
+        "summary": f"Stock showed {sentiment} movement with ${price_change:.2f} change"
+    })
+
+
+def _compute_change(open_p, close_p):
+    """
+    CHANGE METRICS - Dollar move and percent move for one trading day
+
+    The single arithmetic kernel behind prompt assembly and the no-API
+    fallback; kept free of Python objects so Numba can JIT-compile it to
+    machine code when installed (backtests call it per historical row).
+    """
+    price_change = close_p - open_p
+    return price_change, (price_change / open_p) * 100.0
+
+
+# Numba compiles the kernel to native code on machines that have it; the
+# plain-Python definition above stands in everywhere else
+try:
+    from numba import njit
+    _compute_change = njit(cache=True)(_compute_change)
+except ImportError:
+    pass
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Child of the pipeline logger (same wiring as pipeline.fetcher) so records
+# flow through the non-blocking queue handler configured in main.py. Lazy %s
+# formatting means the raw-response slices below are never built when DEBUG
+# is off - material across a 1000-row cached backtest
+logger = logging.getLogger('pipeline.analyzer')
+
+def _sanitize_json(s):
+    """
+    SINGLE-PASS JSON CLEANER - Fix quotes and trailing commas in one walk
+
+    Fuses the old three-stage cleanup (quote str.replace plus two
+    trailing-comma regex subs) into one left-to-right pass: single quotes
+    become double quotes, and a comma whose next non-whitespace character
+    is '}' or ']' is dropped. One scan and one allocation instead of three
+    intermediate strings.
+    """
+    out = []
+    i = 0
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if c == "'":
+            out.append('"')
+        elif c == ',':
+            j = i + 1
+            while j < n and s[j] in ' \t\n\r':
+                j += 1
+            if j < n and s[j] in '}]':
+                i = j - 1          # drop the comma and the whitespace run
+            else:
+                out.append(',')
+        else:
+            out.append(c)
+        i += 1
+    return ''.join(out)
+
+# SHARED PROMPT TEMPLATE - One parsed template object reused for every row
+# (single-day and batch prompts both render through it), rather than a
+# per-call f-string; keeping it module-level also makes the exact prompt
+# bytes easy to audit against the provider's prefix cache
+_PROMPT_TEMPLATE = """STOCK DATA:
+- Symbol: {symbol} on {date}
+- Open: ${open_price:.2f}
+- Close: ${close_price:.2f}
+- Change: ${price_change:+.2f} ({change_pct:+.2f}%)
+- High: ${high_price:.2f}
+- Low: ${low_price:.2f}
+- Volume: {volume:,}"""
+
+class _AsyncRateLimiter:
+    """
+    ASYNC RATE LIMITER - Token-bucket guard for the OpenRouter quota
+
+    The asyncio counterpart of data_fetcher.RateLimiter: a sliding
+    60-second window of request timestamps, awaited instead of slept so
+    other in-flight analyses keep running while one task waits its turn.
+    Holding throughput AT the RPM ceiling beats bursting past it - 429s
+    force backoff that wastes more time than pacing does.
+
+    A limit of 0 (the default when OPENROUTER_RPM is unset) disables
+    throttling entirely.
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self._lock = asyncio.Lock()
+        self._timestamps = deque()
+
+    async def acquire(self):
+        """Wait until a request slot is available within the rate window"""
+        if not self.per_minute:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            while self._timestamps and now - self._timestamps[0] >= 60:
+                self._timestamps.popleft()
+            if len(self._timestamps) >= self.per_minute:
+                wait = 60 - (now - self._timestamps[0])
+                await asyncio.sleep(wait)
+                self._timestamps.popleft()
+            self._timestamps.append(time.monotonic())
+
+
+def _extract_json(text, open_char='{', close_char='}'):
+    """
+    BALANCED-SPAN SCANNER - Find the first complete JSON value in one pass
+
+    Replaces the old greedy regex extraction: a single O(n) walk tracking
+    bracket depth plus string/escape state, terminating at the matching
+    close bracket instead of scanning to the last bracket in the buffer
+    (which also mis-grabbed trailing prose containing a stray brace).
+
+    RETURNS: The balanced substring, or None if no complete value exists
+    """
+    start = text.find(open_char)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == open_char:
+            depth += 1
+        elif char == close_char:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+# STABLE SYSTEM PROMPT - Fixed instruction prefix shared by every request
+#
+# WHY THIS IS SEPARATE FROM THE PER-DAY DATA:
+# - Providers (OpenAI/Anthropic/DeepSeek) cache byte-identical prompt prefixes,
+#   discounting input tokens and cutting time-to-first-token on every call
+# - Only the small per-day stock block changes between runs, so keeping this
+#   prefix stable maximizes the provider-side cache hit rate
+# - PROMPT_PREFIX_VERSION lets us bump the cache deliberately when the
+#   instructions change, instead of invalidating it with trivial edits
+SYSTEM_PROMPT = """You are a fintech analyst. Analyze the stock data provided by the user and respond with VALID JSON only.
+
+RESPOND WITH VALID JSON ONLY (no extra text):
+
+{
+    "sentiment": "bullish",
+    "risk_score": 6,
+    "recommendations": [
+        "First recommendation",
+        "Second recommendation",
+        "Third recommendation"
+    ],
+    "price_prediction": 225.50,
+    "summary": "Brief analysis summary"
+}
+
+Make sure recommendations are separate strings in the array, and sentiment matches the price movement."""
+
 class LLMAnalyzer:
     """
     LLM ANALYZER CLASS - The AI-Powered Financial Intelligence Engine
@@ -46,13 +275,41 @@ class LLMAnalyzer:
         self.provider = os.getenv('LLM_PROVIDER', 'openrouter')
         self.model = os.getenv('LLM_MODEL', 'meta-llama/llama-3.2-3b-instruct:free')
         self.openrouter_key = os.getenv('OPENROUTER_API_KEY')
+
+        # PREFIX CACHE VERSIONING - Bump PROMPT_PREFIX_VERSION to deliberately
+        # invalidate the provider-side prompt cache after instruction changes
+        prefix_version = os.getenv('PROMPT_PREFIX_VERSION', '1')
+        self.system_prompt = f"{SYSTEM_PROMPT}\n\n[prompt-version: {prefix_version}]"
+
+        # POOLED SESSION - Keep-alive to openrouter.ai skips the TCP+TLS
+        # handshake on every call after the first; transient failures
+        # (429/5xx) retry with exponential backoff instead of surfacing as
+        # a lost analysis. Auth and content-type ride on the session once.
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504]
+            )
+        ))
+        self._session.headers['Content-Type'] = 'application/json'
+        if self.openrouter_key:
+            self._session.headers['Authorization'] = f'Bearer {self.openrouter_key}'
+
+        # PERSISTENT RESPONSE CACHE - Raw model responses survive process
+        # restarts, so a rerun of an already-analyzed (symbol, date) replays
+        # the stored response instead of paying the LLM round-trip again
+        self._file_cache = FileCache()
         
     def analyze_stock_data(self, stock_data):
         """
         MAIN ANALYSIS METHOD - Convert stock data into AI-powered business intelligence
         
         PARAMETERS:
-        - stock_data: Dictionary with OHLC prices, volume, etc. from data_fetcher.py
+        - stock_data: DailyRow with OHLC prices, volume, etc. from data_fetcher.py
         
         RETURNS:
         Dictionary with sentiment, risk score, recommendations, predictions
@@ -72,16 +329,120 @@ class LLMAnalyzer:
             
         # STEP 1: Create structured prompt for AI analysis
         prompt = self._create_analysis_prompt(stock_data)
-        
+
         # STEP 2: Send to appropriate AI provider
+        # The on-disk cache is checked first - keyed by model + prompt, so a
+        # repeat run for the same (symbol, date) replays the stored response
         if self.provider == 'openrouter':
-            response = self._call_openrouter(prompt)
+            key = hashlib.md5((self.model + prompt).encode()).hexdigest()
+            response = self._file_cache.get(stock_data.symbol, stock_data.date, key)
+            if response is None:
+                response = self._call_openrouter(prompt)
+                if response:
+                    self._file_cache.put(stock_data.symbol, stock_data.date,
+                                         key, self.model, response)
         else:
             response = self._get_demo_analysis(stock_data)
-            
+
         # STEP 3: Parse and structure the AI response
         return self._parse_llm_response(response, stock_data)
     
+    def analyze_stock_data_batch(self, stock_datas):
+        """
+        BATCH ANALYSIS - Analyze many trading days in one LLM round-trip
+
+        PARAMETERS:
+        - stock_datas: List of DailyRow records (None entries are dropped)
+
+        RETURNS:
+        List of analysis dicts in the same order as the input
+
+        WHY BATCHING:
+        - One HTTP/TLS round-trip and one shared system prompt amortized
+          over N rows instead of N separate calls; the per-row cost is just
+          the small OHLCV block plus its slice of the response
+        - LLM_BATCH_SIZE (default 8) caps rows per call - beyond that the
+          response grows enough that latency and parse-failure risk climb
+
+        FAILURE HANDLING: If the model returns a malformed array or the
+        wrong number of entries, each uncovered row falls back to the same
+        per-row demo/rule-based path analyze_stock_data uses.
+        """
+        stock_datas = [data for data in stock_datas if data]
+        if not stock_datas:
+            return []
+
+        batch_size = int(os.getenv('LLM_BATCH_SIZE', 8))
+        results = []
+        for start in range(0, len(stock_datas), batch_size):
+            chunk = stock_datas[start:start + batch_size]
+            if len(chunk) == 1:
+                results.append(self.analyze_stock_data(chunk[0]))
+                continue
+
+            response = None
+            if self.provider == 'openrouter':
+                response = self._call_openrouter(self._create_batch_prompt(chunk),
+                                                 batch_size=len(chunk))
+            results.extend(self._parse_batch_response(response, chunk))
+        return results
+
+    def _create_batch_prompt(self, datas):
+        """
+        BATCH PROMPT BUILDER - Numbered per-day blocks under one instruction
+
+        The system prompt (and its provider-side prefix cache entry) stays
+        byte-identical to the single-row path; only this user message asks
+        for an array instead of a single object.
+        """
+        blocks = "\n\n".join(
+            f"{i}. {self._create_analysis_prompt(data)}"
+            for i, data in enumerate(datas, 1)
+        )
+        return (
+            f"Analyze each of the following {len(datas)} stocks. "
+            f"Respond with a JSON array of exactly {len(datas)} objects in the "
+            "same order, each following the schema above.\n\n"
+            f"{blocks}"
+        )
+
+    def _parse_batch_response(self, llm_response, datas):
+        """
+        BATCH RESPONSE PARSER - Split one JSON array back into per-row results
+
+        Each well-formed array entry goes through the normal validation in
+        _parse_llm_response; missing or malformed entries fall back per-row.
+        """
+        parsed = None
+        if llm_response:
+            try:
+                cleaned = llm_response.strip()
+                if "```json" in cleaned:
+                    cleaned = cleaned.split("```json")[1].split("```")[0]
+                elif "```" in cleaned:
+                    cleaned = cleaned.split("```")[1].split("```")[0]
+
+                cleaned = _extract_json(cleaned, '[', ']') or cleaned
+
+                try:
+                    parsed = json_backend.loads(cleaned)
+                except ValueError:
+                    parsed = json.loads(cleaned)
+            except Exception as e:
+                logger.warning("Batch JSON parsing failed: %s", e)
+                parsed = None
+
+        if not isinstance(parsed, list):
+            parsed = []
+        if len(parsed) != len(datas):
+            logger.warning("Batch size mismatch: expected %s, got %s", len(datas), len(parsed))
+
+        results = []
+        for i, data in enumerate(datas):
+            entry = parsed[i] if i < len(parsed) and isinstance(parsed[i], dict) else None
+            results.append(self._parse_llm_response(entry, data))
+        return results
+
     def _create_analysis_prompt(self, data):
         """
         PROMPT ENGINEERING - Create structured request for AI financial analysis
@@ -93,48 +454,33 @@ class LLMAnalyzer:
         - Calculate key metrics (price change %) for AI consideration
         
         PROMPT STRATEGY:
-        - Role definition: "You are a fintech analyst"
+        - Role and output format live in the stable SYSTEM_PROMPT prefix
+          (cached provider-side), so this method only renders the small
+          per-day data block that actually changes between calls
         - Clear data presentation with calculated metrics
-        - Specific output format request (JSON only)
         - Professional financial terminology requirements
-        
+
         WHY THIS APPROACH WORKS:
         - AI models respond better to structured, role-based prompts
-        - JSON format ensures machine-readable responses
+        - Keeping the instruction prefix byte-identical across calls lets
+          providers reuse their prompt cache (cheaper, faster)
         - Calculated metrics help AI understand market movement significance
         """
-        price_change = data['close_price'] - data['open_price']
-        change_pct = (price_change / data['open_price']) * 100
-        
-        return f"""
-You are a fintech analyst. Analyze this stock data and respond with VALID JSON only.
-
-STOCK DATA:
-- Symbol: {data['symbol']} on {data['date']}
-- Open: ${data['open_price']:.2f}
-- Close: ${data['close_price']:.2f}
-- Change: ${price_change:+.2f} ({change_pct:+.2f}%)
-- High: ${data['high_price']:.2f}
-- Low: ${data['low_price']:.2f}
-- Volume: {data['volume']:,}
-
-RESPOND WITH VALID JSON ONLY (no extra text):
+        price_change, change_pct = _compute_change(data.open_price, data.close_price)
 
-{{
-    "sentiment": "bullish",
-    "risk_score": 6,
-    "recommendations": [
-        "First recommendation",
-        "Second recommendation", 
-        "Third recommendation"
-    ],
-    "price_prediction": 225.50,
-    "summary": "Brief analysis summary"
-}}
-
-Make sure recommendations are separate strings in the array, and sentiment matches the price movement."""
+        return _PROMPT_TEMPLATE.format_map({
+            'symbol': data.symbol,
+            'date': data.date,
+            'open_price': data.open_price,
+            'close_price': data.close_price,
+            'high_price': data.high_price,
+            'low_price': data.low_price,
+            'volume': data.volume,
+            'price_change': price_change,
+            'change_pct': change_pct
+        })
 
-    def _call_openrouter(self, prompt):
+    def _call_openrouter(self, prompt, batch_size=1):
         """
         OPENROUTER API INTEGRATION - Send analysis request to LLaMA AI model
         
@@ -147,8 +493,8 @@ Make sure recommendations are separate strings in the array, and sentiment match
         API DETAILS:
         - Endpoint: https://openrouter.ai/api/v1/chat/completions
         - Model: meta-llama/llama-3.2-3b-instruct:free
-        - Max tokens: 500 (sufficient for structured JSON response)
-        - Temperature: 0.7 (balanced creativity vs consistency)
+        - Max tokens: 200 (the structured JSON response is ~120 tokens)
+        - Temperature: 0.0 (fixed output shape - deterministic decode)
         
         BUSINESS VALUE:
         - Access to enterprise-grade AI models
@@ -158,38 +504,215 @@ Make sure recommendations are separate strings in the array, and sentiment match
         """
         # SAFETY CHECK: Verify API key is available
         if not self.openrouter_key or self.openrouter_key == "your_openrouter_key_here":
-            print("Warning: No OpenRouter API key - using demo analysis")
+            logger.warning("No OpenRouter API key - using demo analysis")
             return None
             
-        # API CONFIGURATION
+        # API CONFIGURATION - auth and content-type live on the session
         url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_key}",
-            "Content-Type": "application/json"
-        }
-        
-        # REQUEST PARAMETERS
-        data = {
-            "model": self.model,                    # LLaMA 3.2 model
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 500,                      # Limit response length
-            "temperature": 0.7                      # Balance creativity/consistency
-        }
-        
+
+        data = self._build_payload(prompt, batch_size)
+
+        # Stream the completion so parsing overlaps with transfer - tokens
+        # arrive over seconds, and we can stop at the closing bracket
+        data["stream"] = True
+
         try:
-            print("Calling LLM for financial analysis...")
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-            
+            logger.debug("Calling LLM for financial analysis...")
+            response = self._session.post(url, json=data, timeout=30, stream=True)
+
             if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
+                return self._read_sse_content(response)
             else:
-                print(f"LLM API Error: {response.status_code}")
-                print(f"Response: {response.text}")
+                logger.error("LLM API Error: %s", response.status_code)
+                logger.error("Response: %s", response.text)
                 return None
         except Exception as e:
-            print(f"LLM Error: {e}")
+            logger.error("LLM Error: %s", e)
             return None
+
+    def _read_sse_content(self, response):
+        """
+        SSE STREAM READER - Assemble the completion as tokens arrive
+
+        PURPOSE:
+        - Concatenate delta.content from each 'data:' event instead of
+          buffering the whole body before any parsing starts
+        - Track JSON bracket depth incrementally ({} and [] together, so
+          an array root with nested objects is not cut short) and return
+          the moment the outer value closes, rather than waiting for the
+          stream to drain
+
+        RETURNS: The accumulated content string, or None if nothing arrived
+        """
+        buffer = []
+        depth = 0
+        in_string = False
+        escaped = False
+        started = False
+
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data: '):
+                    continue
+                payload = line[6:]
+                if payload == '[DONE]':
+                    break
+                try:
+                    event = json_backend.loads(payload)
+                except ValueError:
+                    continue
+                delta = (event.get('choices') or [{}])[0].get('delta', {}).get('content')
+                if not delta:
+                    continue
+                buffer.append(delta)
+
+                # Incremental bracket-depth scan over just this delta - same
+                # string/escape rules as _extract_json, carried across chunks
+                for char in delta:
+                    if in_string:
+                        if escaped:
+                            escaped = False
+                        elif char == '\\':
+                            escaped = True
+                        elif char == '"':
+                            in_string = False
+                        continue
+                    if char == '"':
+                        in_string = True
+                    elif char in '{[':
+                        depth += 1
+                        started = True
+                    elif char in '}]':
+                        depth -= 1
+                        if started and depth == 0:
+                            return ''.join(buffer)
+
+            return ''.join(buffer) or None
+        finally:
+            response.close()
+
+    def _build_payload(self, prompt, batch_size=1):
+        """
+        REQUEST PAYLOAD BUILDER - Shared by the sync and async call paths
+
+        Stable system prefix first so providers can serve it from their
+        prompt cache; only the user block varies per day. batch_size scales
+        the token budget and controls JSON mode: batch prompts expect an
+        array response, which json_object mode would forbid.
+        """
+        payload = {
+            "model": self.model,                    # LLaMA 3.2 model
+            "messages": [
+                # cache_control marks the fixed preamble as a reusable
+                # prefix: providers that support prompt caching (OpenRouter
+                # forwards the Anthropic/OpenAI convention) keep its KV
+                # state across calls so only the per-day block pays prefill;
+                # providers without it ignore the annotation
+                {"role": "system", "content": [{
+                    "type": "text",
+                    "text": self.system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }]},
+                {"role": "user", "content": prompt}
+            ],
+            # Decode is sequential: each analysis object is ~120 tokens, so
+            # 200 per row caps latency without ever truncating mid-array
+            "max_tokens": 200 * batch_size,
+            # The output shape is fixed - determinism beats creativity here
+            "temperature": 0.0
+        }
+        if batch_size == 1:
+            # JSON mode stops the model wrapping the object in prose, but
+            # it forces an object root - only valid for single-row calls
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    async def _call_openrouter_async(self, client, prompt, limiter=None):
+        """
+        ASYNC OPENROUTER CALL - One non-blocking completion request
+
+        Same payload and error handling as _call_openrouter; the event loop
+        overlaps many of these over the shared httpx client's keep-alive
+        connections instead of paying full RTT per request sequentially.
+
+        The optional limiter paces requests under the OPENROUTER_RPM quota;
+        429 responses honor Retry-After for up to 3 attempts.
+        """
+        if not self.openrouter_key or self.openrouter_key == "your_openrouter_key_here":
+            return None
+
+        try:
+            for attempt in range(3):
+                if limiter is not None:
+                    await limiter.acquire()
+                response = await client.post(
+                    "https://openrouter.ai/api/v1/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {self.openrouter_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json=self._build_payload(prompt),
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    return response.json()['choices'][0]['message']['content']
+                if response.status_code == 429 and attempt < 2:
+                    # Throttled anyway - wait out the provider's own hint
+                    try:
+                        retry_after = int(response.headers.get('Retry-After', 2 ** attempt))
+                    except ValueError:
+                        retry_after = 2 ** attempt
+                    await asyncio.sleep(retry_after)
+                    continue
+                logger.error("LLM API Error: %s", response.status_code)
+                return None
+        except Exception as e:
+            logger.error("LLM Error: %s", e)
+            return None
+
+    async def _analyze_many_async(self, stock_datas):
+        """
+        ASYNC FAN-OUT - Analyze all rows concurrently over one client
+
+        OPENROUTER_MAX_PARALLEL (default 4) bounds in-flight requests so the
+        fan-out doesn't trip the provider's 429 rate limiting.
+        """
+        semaphore = asyncio.Semaphore(int(os.getenv('OPENROUTER_MAX_PARALLEL', 4)))
+        limiter = _AsyncRateLimiter(int(os.getenv('OPENROUTER_RPM', 0)))
+        limits = httpx.Limits(max_connections=16)
+
+        async with httpx.AsyncClient(limits=limits) as client:
+            async def analyze_one(data):
+                async with semaphore:
+                    response = await self._call_openrouter_async(
+                        client, self._create_analysis_prompt(data), limiter)
+                return self._parse_llm_response(response, data)
+
+            return list(await asyncio.gather(
+                *(analyze_one(data) for data in stock_datas)))
+
+    def analyze_many(self, stock_datas):
+        """
+        CONCURRENT MULTI-ROW ANALYSIS - Synchronous entry point
+
+        PARAMETERS:
+        - stock_datas: List of DailyRow records (None entries are dropped)
+
+        RETURNS:
+        List of analysis dicts in input order
+
+        The workload is pure network I/O, so overlapping the calls wins
+        almost linearly up to the parallelism cap. Falls back to the
+        sequential path when httpx isn't installed or in demo mode.
+        """
+        stock_datas = [data for data in stock_datas if data]
+        if not stock_datas:
+            return []
+
+        if httpx is None or self.provider != 'openrouter':
+            return [self.analyze_stock_data(data) for data in stock_datas]
+
+        return asyncio.run(self._analyze_many_async(stock_datas))
     
     def _get_demo_analysis(self, data):
         """
@@ -207,24 +730,16 @@ Make sure recommendations are separate strings in the array, and sentiment match
         - Provides realistic recommendations based on market behavior
         - Maintains professional analysis quality
         """
-        print("Demo mode: Generating intelligent sample analysis")
-        
-        # CALCULATE ACTUAL PRICE MOVEMENT for realistic analysis
-        price_change = data['close_price'] - data['open_price']
+        logger.debug("Demo mode: Generating intelligent sample analysis")
+
+        # CALCULATE ACTUAL PRICE MOVEMENT for realistic analysis; rounding
+        # to cents makes the memo key - repeated buckets across a backtest
+        # hit the cache instead of re-serializing the same string
+        price_change = round(data.close_price - data.open_price, 2)
         sentiment = "bullish" if price_change > 0 else "bearish" if price_change < 0 else "neutral"
-        
-        return json.dumps({
-            "sentiment": sentiment,
-            "risk_score": 5,
-            "recommendations": [
-                "Monitor volume trends for momentum confirmation",
-                "Watch for price action near VWAP levels", 
-                "Consider position sizing based on volatility"
-            ],
-            "price_prediction": round(data['close_price'] * 1.02, 2),
-            "summary": f"Stock showed {sentiment} movement with ${price_change:.2f} change"
-        })
-    
+
+        return _demo_analysis_json(sentiment, price_change, round(data.close_price, 2))
+
     def _parse_llm_response(self, llm_response, stock_data):
         """
         RESPONSE PARSER - Robust processing of AI analysis into structured format
@@ -251,32 +766,40 @@ Make sure recommendations are separate strings in the array, and sentiment match
             llm_response = self._get_demo_analysis(stock_data)
             
         try:
-            # DEBUG: Print raw response for troubleshooting
-            print(f"Raw LLM Response: {llm_response[:200]}...")
+            # DEBUG: Log raw response for troubleshooting (lazy - the slice
+            # only happens when DEBUG is enabled)
+            logger.debug("Raw LLM Response: %.200s...", llm_response)
             
-            # STEP 1: Clean the response string
+            # STEP 1: Parse the response string
             if isinstance(llm_response, str):
                 cleaned = llm_response.strip()
-                
-                # Remove markdown code blocks (```json ... ```)
-                if "```json" in cleaned:
-                    cleaned = cleaned.split("```json")[1].split("```")[0]
-                elif "```" in cleaned:
-                    cleaned = cleaned.split("```")[1].split("```")[0]
-                
-                # Extract JSON content using regex
-                json_match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-                if json_match:
-                    cleaned = json_match.group()
-                
-                # Fix common JSON formatting issues
-                cleaned = cleaned.replace("'", '"')           # Single to double quotes
-                cleaned = re.sub(r',\s*}', '}', cleaned)      # Remove trailing commas
-                cleaned = re.sub(r',\s*]', ']', cleaned)      # Remove trailing commas in arrays
-                
-                print(f"Cleaned JSON: {cleaned[:200]}...")
-                
-                analysis = json.loads(cleaned)
+
+                # JSON mode means the response usually IS the object - try
+                # the direct parse before paying for any cleanup passes
+                try:
+                    analysis = json_backend.loads(cleaned)
+                except ValueError:
+                    # Model ignored JSON mode - fall back to cleanup
+
+                    # Remove markdown code blocks (```json ... ```)
+                    if "```json" in cleaned:
+                        cleaned = cleaned.split("```json")[1].split("```")[0]
+                    elif "```" in cleaned:
+                        cleaned = cleaned.split("```")[1].split("```")[0]
+
+                    # Extract the first balanced JSON object (single-pass scan)
+                    cleaned = _extract_json(cleaned) or cleaned
+
+                    # Fix common JSON formatting issues in a single pass
+                    cleaned = _sanitize_json(cleaned)
+
+                    logger.debug("Cleaned JSON: %.200s...", cleaned)
+
+                    # Fast strict parse first; stdlib is the lenient fallback
+                    try:
+                        analysis = json_backend.loads(cleaned)
+                    except ValueError:
+                        analysis = json.loads(cleaned)
             else:
                 analysis = llm_response
                 
@@ -292,41 +815,40 @@ Make sure recommendations are separate strings in the array, and sentiment match
             if not isinstance(risk_score, int) or risk_score < 1 or risk_score > 10:
                 risk_score = 5
                 
-            # RECOMMENDATIONS VALIDATION - Ensure usable advice list
-            recommendations = analysis.get('recommendations', [])
-            if not isinstance(recommendations, list) or len(recommendations) == 0:
-                recommendations = ['Monitor market conditions', 'Review position sizing', 'Watch key levels']
-                
+            # RECOMMENDATIONS VALIDATION - Slice to 3 BEFORE validating so an
+            # oversized model response never keeps its full list alive
+            recommendations = analysis.get('recommendations') or []
+            if not isinstance(recommendations, list):
+                recommendations = []
+            recommendations = [r for r in recommendations[:3] if isinstance(r, str)]
+            if not recommendations:
+                recommendations = list(DEFAULT_RECS)
+
+
             # RETURN STRUCTURED BUSINESS INTELLIGENCE
             return {
                 'sentiment': sentiment,
                 'risk_score': risk_score,
-                'recommendations': recommendations[:3],  # Limit to top 3 recommendations
-                'price_prediction': analysis.get('price_prediction', stock_data['close_price']),
+                'recommendations': recommendations,      # Already capped at 3 above
+                'price_prediction': analysis.get('price_prediction', stock_data.close_price),
                 'full_analysis': analysis.get('summary', analysis.get('analysis', 'Analysis completed')),
                 'model_used': self.model,
                 'raw_response': llm_response
             }
             
         except Exception as e:
-            print(f"JSON parsing failed: {e}")
-            print(f"Problematic response: {llm_response}")
+            logger.warning("JSON parsing failed: %s", e)
+            logger.debug("Problematic response: %s", llm_response)
             
             # INTELLIGENT FALLBACK - Rule-based analysis using actual market data
-            price_change = stock_data['close_price'] - stock_data['open_price']
-            change_pct = (price_change / stock_data['open_price']) * 100
+            _, change_pct = _compute_change(stock_data.open_price, stock_data.close_price)
             
-            # MARKET MOVEMENT ANALYSIS
-            if change_pct > 2:
-                sentiment = 'bullish'
-                risk_score = 4
-            elif change_pct < -2:
-                sentiment = 'bearish'
-                risk_score = 7
-            else:
-                sentiment = 'neutral'
-                risk_score = 5
-                
+            # MARKET MOVEMENT ANALYSIS - shared -2%/+2% buckets
+            bucket = 0 if change_pct < -2 else (2 if change_pct > 2 else 1)
+            sentiment = _FALLBACK_SENTIMENTS[bucket]
+            risk_score = _FALLBACK_RISKS[bucket]
+
+
             return {
                 'sentiment': sentiment,
                 'risk_score': risk_score,
@@ -335,12 +857,64 @@ Make sure recommendations are separate strings in the array, and sentiment match
                     'Consider volume analysis for confirmation',
                     'Watch key support/resistance levels'
                 ],
-                'price_prediction': round(stock_data['close_price'] * (1 + change_pct/100/10), 2),
+                'price_prediction': round(stock_data.close_price * (1 + change_pct/100/10), 2),
                 'full_analysis': f'Fallback analysis: {sentiment} sentiment based on {change_pct:.2f}% price movement',
                 'model_used': f'{self.model}_fallback',
                 'raw_response': str(llm_response)
             }
 
+    def fallback_batch(self, stock_datas):
+        """
+        VECTORIZED FALLBACK - Rule-based analyses for a whole batch at once
+
+        PURPOSE:
+        - Keep the pipeline producing recommendations when the LLM API is
+          down or rate-limited, without calling the per-row fallback N times
+        - Backtests over thousands of historical rows hit this path hard
+
+        MECHANISM:
+        - One numpy pass computes change_pct for every row, then
+          np.digitize buckets it at -2% / +2% into bearish/neutral/bullish
+          with matching risk scores - no per-ticker Python branching
+        - Falls back to a plain per-row loop when numpy is unavailable
+
+        RETURNS: List of analysis dicts, same shape as _parse_llm_response
+        """
+        if np is not None:
+            open_p = np.array([data.open_price for data in stock_datas], dtype=np.float64)
+            close_p = np.array([data.close_price for data in stock_datas], dtype=np.float64)
+            pct = (close_p - open_p) / open_p * 100.0
+
+            # Branchless classification: bucket index 0/1/2 per row in one pass
+            idx = np.digitize(pct, [-2.0, 2.0])
+            pred = np.round(close_p * (1 + pct / 1000), 2)
+        else:
+            pct = [(data.close_price - data.open_price) / data.open_price * 100
+                   for data in stock_datas]
+            idx = [0 if p < -2 else (2 if p > 2 else 1) for p in pct]
+            pred = [round(data.close_price * (1 + p / 1000), 2)
+                    for data, p in zip(stock_datas, pct)]
+
+        results = []
+        for i, data in enumerate(stock_datas):
+            bucket = int(idx[i])
+            sentiment = _FALLBACK_SENTIMENTS[bucket]
+            change_pct = float(pct[i])
+            results.append({
+                'sentiment': sentiment,
+                'risk_score': _FALLBACK_RISKS[bucket],
+                'recommendations': [
+                    f'Stock moved {change_pct:.1f}% - monitor for continuation',
+                    'Consider volume analysis for confirmation',
+                    'Watch key support/resistance levels'
+                ],
+                'price_prediction': float(pred[i]),
+                'full_analysis': f'Fallback analysis: {sentiment} sentiment based on {change_pct:.2f}% price movement',
+                'model_used': f'{self.model}_fallback',
+                'raw_response': ''
+            })
+        return results
+
 # TESTING FUNCTION - Comprehensive validation with real market data
 def test_analyzer():
     """
@@ -375,7 +949,7 @@ def test_analyzer():
         print("Could not fetch real data for testing")
         return False
     
-    print(f"Using REAL data: Open ${real_data['open_price']} → Close ${real_data['close_price']}")
+    print(f"Using REAL data: Open ${real_data.open_price} → Close ${real_data.close_price}")
     
     # PERFORM AI ANALYSIS
     analyzer = LLMAnalyzer()
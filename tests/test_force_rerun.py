@@ -0,0 +1,128 @@
+"""
+REGRESSION TEST - A failed --force rerun must keep the old stored rows
+
+PURPOSE: The force_rerun path deletes the existing (date, symbol) row and
+its recommendations before inserting fresh data. That delete and the
+re-insert MUST share one transaction: if the analysis step fails mid-run,
+the rollback has to restore the old rows. A nested use of the shared
+scoped session once committed the delete early, turning a failed rerun
+into permanent data loss - this test pins the fixed behavior.
+
+HOW IT WORKS: Runs the real run_daily_pipeline against an in-memory
+SQLite database with a stub fetcher and an analyzer that always raises.
+The run must report failure and the seeded rows must survive untouched.
+
+USAGE: python -m unittest discover tests (from the repository root)
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import main
+from analysis_cache import AnalysisCache
+from data_fetcher import DailyRow
+from database import AIRecommendations, Base, DailyMetrics, DatabaseManager
+
+
+TRADING_DAY = date(2026, 8, 28)
+
+
+class _StubFetcher:
+    """Returns one canned DailyRow - no network, no API key"""
+
+    def __init__(self, row):
+        self.row = row
+
+    def fetch_daily_data(self, symbol, target_date):
+        return self.row
+
+
+class _FailingAnalyzer:
+    """Simulates the LLM step blowing up mid-transaction"""
+
+    def analyze_stock_data(self, stock_data):
+        raise RuntimeError("simulated analysis failure")
+
+
+def _sqlite_pipeline():
+    """Build a FintechPipeline wired to a fresh in-memory database"""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+
+    db = DatabaseManager.__new__(DatabaseManager)
+    db.database_url = 'sqlite://'
+    db.engine = engine
+    db.SessionLocal = scoped_session(sessionmaker(bind=engine,
+                                                  expire_on_commit=False))
+    db._tables_ready = True
+    db._status_ok = True
+    db._status_checked_at = time.monotonic()
+
+    fresh_row = DailyRow(
+        date=TRADING_DAY, symbol='AAPL',
+        open_price=110.0, close_price=111.0, high_price=112.0,
+        low_price=109.0, volume=2000, vwap=110.5, transactions=20,
+        raw_data=None
+    )
+
+    pipeline = main.FintechPipeline.__new__(main.FintechPipeline)
+    pipeline.db = db
+    pipeline.symbol = 'AAPL'
+    pipeline.fetcher = _StubFetcher(fresh_row)
+    pipeline.analyzer = _FailingAnalyzer()
+    pipeline.cache = AnalysisCache(db)
+    return pipeline
+
+
+class ForceRerunKeepsOldDataTest(unittest.TestCase):
+
+    def test_failed_analysis_during_force_keeps_old_rows(self):
+        pipeline = _sqlite_pipeline()
+
+        # Seed the already-stored day the forced rerun will try to replace
+        with pipeline.db.session() as session:
+            old = DailyMetrics(
+                date=TRADING_DAY, symbol='AAPL',
+                open_price=100.0, close_price=101.0, high_price=102.0,
+                low_price=99.0, volume=1000, vwap=100.5, transactions=10
+            )
+            session.add(old)
+            session.flush()
+            session.add(AIRecommendations(
+                date=TRADING_DAY, metrics_id=old.id, sentiment='bullish',
+                recommendations=['hold'], risk_score=5,
+                price_prediction=102.0, full_analysis='seeded',
+                model_used='seed-model'
+            ))
+            old_id = old.id
+
+        ok = pipeline.run_daily_pipeline(
+            target_date=TRADING_DAY.isoformat(), force_rerun=True, symbol='AAPL')
+
+        # The run must report failure, not success
+        self.assertFalse(ok)
+
+        # And the old rows must have survived the rollback untouched
+        with pipeline.db.session() as session:
+            metrics = session.query(DailyMetrics).all()
+            self.assertEqual(len(metrics), 1)
+            self.assertEqual(metrics[0].id, old_id)
+            self.assertEqual(float(metrics[0].close_price), 101.0)
+
+            recs = session.query(AIRecommendations).all()
+            self.assertEqual(len(recs), 1)
+            self.assertEqual(recs[0].model_used, 'seed-model')
+            self.assertEqual(recs[0].metrics_id, old_id)
+
+
+if __name__ == '__main__':
+    unittest.main()